@@ -15,3 +15,9 @@ DATABASE_URL = f"sqlite:///{BASE_DIR}/logs.db"
 # Temporary directory for zip extraction
 TEMP_DIR = os.path.join(BASE_DIR, "temp")
 os.makedirs(TEMP_DIR, exist_ok=True)
+
+# Zip ingestion: number of worker processes used to decode archive members
+# (defaults to the number of CPU cores) and the minimum uncompressed archive
+# size before the process pool is used instead of decoding inline.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+INGEST_PARALLEL_MIN_BYTES = int(os.getenv("INGEST_PARALLEL_MIN_BYTES", 4 * 1024 * 1024))
@@ -10,6 +10,8 @@ from typing import List, Optional
 
 from app.database import get_db
 from app.database.models import GitHubSelection
+from app.services.log_service import LogService
+from app.services.selection_service import EXCLUDE, FILE, PATTERN, SelectionService
 from sqlalchemy.orm import Session
 
 from pydantic import BaseModel
@@ -63,6 +65,34 @@ class GitHubSelectionDetailResponse(BaseModel):
     selected_files: Optional[List[str]] = None
     created_at: Optional[datetime] = None # Keep as datetime for internal use
 
+class SelectionDeltaPayload(BaseModel):
+    files: List[str] = []
+    patterns: List[str] = [] # Globs ("src/**/*.py") or directories ("docs/")
+
+class SelectionDeltaResponse(BaseModel):
+    changed: int
+    total_files: int
+    total_patterns: int
+    total_excludes: int
+
+class SelectionEntryResponse(BaseModel):
+    path: str
+    kind: str # "file", "pattern" or "exclude"
+
+class SelectionEntriesPage(BaseModel):
+    items: List[SelectionEntryResponse]
+    total: int
+    offset: int
+    limit: int
+
+class SelectionFilesPage(BaseModel):
+    files: List[str]
+    limit: int
+    has_more: bool
+    next_after: Optional[str] = None # Pass as `after` to get the next page
+    tree_cached: bool # Patterns are only expanded once the repo tree has been fetched
+    tree_truncated: bool # GitHub returned a partial tree, pattern matches may be missing
+
 class GitHubSelectionListResponse(BaseModel):
     id: str
     name: str
@@ -83,7 +113,10 @@ async def get_repo_info(repo_url: str):
         raise HTTPException(status_code=400, detail=f"Invalid GitHub repository URL: {repo_url}")
 
 @router.get("/tree", response_model=GitHubTreeResponse)
-async def get_github_repo_tree(repo_url: str = Query(..., description="Full URL of the GitHub repository (e.g., https://github.com/owner/repo)")):
+async def get_github_repo_tree(
+    repo_url: str = Query(..., description="Full URL of the GitHub repository (e.g., https://github.com/owner/repo)"),
+    db: Session = Depends(get_db)
+):
     """Fetches the file tree structure of a GitHub repository recursively."""
     owner, repo = await get_repo_info(repo_url)
     api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/main?recursive=1" # Assumes main branch
@@ -95,6 +128,8 @@ async def get_github_repo_tree(repo_url: str = Query(..., description="Full URL
             response.raise_for_status()  # Raise HTTP errors
             data = response.json()
             print(f"Successfully fetched tree, truncated: {data.get('truncated')}")
+            # Keep the tree around so selection patterns can be expanded without GitHub
+            SelectionService.cache_tree(f"{owner}/{repo}", data, db)
             return data
         except httpx.HTTPStatusError as e:
             print(f"GitHub API error: {e.response.status_code} - {e.response.text}")
@@ -157,18 +192,46 @@ async def add_github_repo(
         print(f"Error adding GitHub repo: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to add repository: {str(e)}")
 
+def get_selection_or_404(selection_id: str, db: Session) -> GitHubSelection:
+    """Loads a selection, moving any legacy selected_files into the entries table."""
+    selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
+    if not selection:
+        raise HTTPException(status_code=404, detail="GitHub selection not found")
+    SelectionService.migrate_legacy_selection(selection, db)
+    return selection
+
+def selection_details(selection: GitHubSelection, db: Session) -> dict:
+    return {
+        "id": selection.id,
+        "name": selection.name,
+        "url": selection.url,
+        "selected_files": list(SelectionService.iter_entry_paths(selection.id, FILE, db)),
+        "created_at": selection.created_at,
+    }
+
+def selection_totals(selection_id: str, changed: int, db: Session) -> dict:
+    return {
+        "changed": changed,
+        "total_files": SelectionService.count_entries(selection_id, FILE, db),
+        "total_patterns": SelectionService.count_entries(selection_id, PATTERN, db),
+        "total_excludes": SelectionService.count_entries(selection_id, EXCLUDE, db),
+    }
+
 @router.get("/{selection_id}", response_model=GitHubSelectionDetailResponse)
 async def get_github_selection_details(
     selection_id: str = Path(..., description="The ID of the GitHub selection"),
     db: Session = Depends(get_db)
 ):
-    """Gets the details of a specific GitHub selection, including selected files."""
+    """
+    Gets the details of a specific GitHub selection, including explicitly selected files.
+    Large selections should be read page by page through /{selection_id}/entries or /{selection_id}/files.
+    """
     try:
-        selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
-        if not selection:
-            raise HTTPException(status_code=404, detail="GitHub selection not found")
+        selection = get_selection_or_404(selection_id, db)
         print(f"Returning details for selection ID: {selection_id}")
-        return selection
+        return selection_details(selection, db)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Error getting GitHub selection details: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve selection details")
@@ -179,27 +242,124 @@ async def update_github_file_selection(
     selection_id: str = Path(..., description="The ID of the GitHub selection to update"),
     db: Session = Depends(get_db)
 ):
-    """Updates the selected files for a specific GitHub repository selection."""
+    """
+    Replaces the selected files for a specific GitHub repository selection.
+    Only the difference with the stored selection is written; prefer the
+    /entries/add and /entries/remove endpoints to avoid sending the whole list.
+    """
     try:
-        selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
-        if not selection:
-            raise HTTPException(status_code=404, detail="GitHub selection not found")
+        selection = get_selection_or_404(selection_id, db)
 
         print(f"Updating selection for ID: {selection_id}")
         print(f"New selected files: {len(payload.selected_files)}")
 
-        selection.selected_files = payload.selected_files
+        SelectionService.replace_files(selection_id, payload.selected_files, db)
         db.commit()
-        db.refresh(selection)
 
         print(f"Successfully updated selection for ID: {selection_id}")
-        return selection
+        return selection_details(selection, db)
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         db.rollback()
         print(f"Error updating GitHub selection: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to update selection: {str(e)}")
 
+@router.post("/{selection_id}/entries/add", response_model=SelectionDeltaResponse)
+async def add_selection_entries(
+    payload: SelectionDeltaPayload,
+    selection_id: str = Path(..., description="The ID of the GitHub selection to update"),
+    db: Session = Depends(get_db)
+):
+    """Adds files and patterns to a selection without resending the rest of it."""
+    try:
+        selection = get_selection_or_404(selection_id, db)
+        changed = SelectionService.select_files(selection, payload.files, db)
+        changed += SelectionService.add_patterns(selection, payload.patterns, db)
+        db.commit()
+        print(f"Added {changed} entries to selection ID: {selection_id}")
+        return selection_totals(selection_id, changed, db)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        db.rollback()
+        print(f"Error adding selection entries: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to add selection entries: {str(e)}")
+
+@router.post("/{selection_id}/entries/remove", response_model=SelectionDeltaResponse)
+async def remove_selection_entries(
+    payload: SelectionDeltaPayload,
+    selection_id: str = Path(..., description="The ID of the GitHub selection to update"),
+    db: Session = Depends(get_db)
+):
+    """
+    Removes files and patterns from a selection without resending the rest of it.
+    Removed files that a pattern still matches are recorded as exclusions.
+    """
+    try:
+        selection = get_selection_or_404(selection_id, db)
+        changed = SelectionService.deselect_files(selection, payload.files, db)
+        changed += SelectionService.remove_patterns(selection, payload.patterns, db)
+        db.commit()
+        print(f"Removed {changed} entries from selection ID: {selection_id}")
+        return selection_totals(selection_id, changed, db)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        db.rollback()
+        print(f"Error removing selection entries: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to remove selection entries: {str(e)}")
+
+@router.get("/{selection_id}/entries", response_model=SelectionEntriesPage)
+async def list_selection_entries(
+    selection_id: str = Path(..., description="The ID of the GitHub selection"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Pages through the stored entries (files, unexpanded patterns and exclusions) of a selection."""
+    try:
+        get_selection_or_404(selection_id, db)
+        items, total = SelectionService.get_entries_page(selection_id, offset, limit, db)
+        return {
+            "items": [{"path": item.path, "kind": item.kind} for item in items],
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error listing selection entries: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve selection entries")
+
+@router.get("/{selection_id}/files", response_model=SelectionFilesPage)
+async def list_selected_files(
+    selection_id: str = Path(..., description="The ID of the GitHub selection"),
+    after: Optional[str] = Query(None, description="Return files after this path (next_after of the previous page)"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Pages through the selected files with patterns expanded against the cached repository tree."""
+    try:
+        selection = get_selection_or_404(selection_id, db)
+        files, has_more = SelectionService.get_files_page(selection, after, limit, db)
+        tree_cached, tree_truncated = SelectionService.get_tree_status(selection.name, db)
+        return {
+            "files": files,
+            "limit": limit,
+            "has_more": has_more,
+            "next_after": files[-1] if has_more else None,
+            "tree_cached": tree_cached,
+            "tree_truncated": tree_truncated,
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error listing selected files: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve selected files")
+
 @router.post("/upload-json-logs/", response_model=dict)
 async def upload_json_logs(logs: List[LogInput], db: Session = Depends(get_db)):
     """
@@ -207,7 +367,7 @@ async def upload_json_logs(logs: List[LogInput], db: Session = Depends(get_db)):
     """
     try:
         for log in logs:
-            new_log = LogFile(filename=log.filename, content=log.content)
+            new_log = LogService.build_log_file(log.filename, log.content)
             db.add(new_log)
         db.commit()
         return {"message": f"{len(logs)} logs uploaded successfully."}
@@ -1,12 +1,17 @@
 import json
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 import httpx
-from app.database import get_db
-from app.database.models import LogFile
+from app.database import SessionLocal, get_db
+from app.database.models import GitHubSelection, LogFile, LogFrame, LogFrameScan
+from app.services.export_service import ExportService
 from app.services.log_service import LogService
 from app.services.sentry_service import SentryService
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from app.services.traceback_service import TracebackService
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -34,7 +39,10 @@ async def upload_logs(file: UploadFile = File(...), db: Session = Depends(get_db
     # Process the file and save to the database
     try:
         print(f"Processing file content for {file.filename}")
-        saved_files = LogService.process_file(content, file.filename, db)
+        # Decoding and the database writes block, keep them off the event loop
+        saved_files = await run_in_threadpool(
+            LogService.process_file, content, file.filename, db
+        )
         return saved_files
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
@@ -56,6 +64,117 @@ async def get_all_logs(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error retrieving logs: {str(e)}")
 
 
+@router.get("/export")
+async def export_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$", description="ndjson or zip"),
+    prefix: Optional[str] = Query(None, description="Only logs whose filename starts with this"),
+    since: Optional[datetime] = Query(None, description="Only logs created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only logs created before this time"),
+    search: Optional[str] = Query(None, description="Only logs whose content contains this text"),
+    after_id: Optional[int] = Query(None, ge=0, description="Resume after this log id"),
+):
+    """
+    Endpoint to stream matching log files as NDJSON or as a zip archive.
+    Rows are read from the database in batches while the response is being
+    sent, so memory use doesn't grow with the size of the export.
+
+    Logs are exported in id order. To resume a cut-off download, request the
+    same filters again with after_id set to the last log received in full:
+    - ndjson: the id of the last complete line
+    - zip: every entry's local file header ("PK\\x03\\x04") carries an extra
+      field with tag 0x474C and the log id as an 8 byte little-endian integer.
+      The last header received may belong to a cut-off entry, so resume after
+      the id in the header before it (app.services.export_service.resume_after_id
+      implements this). A complete archive ends with export-manifest.json,
+      which holds the last exported id.
+    """
+
+    def stream():
+        # The request's session is gone once the endpoint returns, so the
+        # stream keeps its own for as long as the client is reading
+        db = SessionLocal()
+        try:
+            query = LogService.filter_logs(
+                db, prefix=prefix, since=since, until=until, search=search, after_id=after_id
+            )
+            if format == "zip":
+                yield from ExportService.iter_zip(query)
+            else:
+                yield from ExportService.iter_ndjson(query)
+        finally:
+            db.close()
+
+    media_type = "application/zip" if format == "zip" else "application/x-ndjson"
+    filename = f"logs-export.{format}"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def selection_repos(selection_id: Optional[str], db: Session) -> Optional[List[str]]:
+    if selection_id is None:
+        return None
+    selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
+    if selection is None:
+        raise HTTPException(status_code=404, detail="GitHub selection not found")
+    return [selection.name]
+
+
+@router.get("/source", response_model=dict)
+async def get_source_context_by_prefix(
+    prefix: str = Query(..., description="Filename prefix of the logs, e.g. the zip name followed by '/'"),
+    selection_id: Optional[str] = Query(None, description="Only resolve against this selection's repository"),
+    context: int = Query(10, ge=0, le=200, description="Lines of context around each frame"),
+    db: Session = Depends(get_db),
+):
+    """
+    Endpoint to retrieve the repository files and line windows referenced by
+    the stack traces of all logs whose filename starts with the prefix
+    """
+    try:
+        repos = selection_repos(selection_id, db)
+        # Older logs get their frames extracted on first use, keep that off the event loop
+        return await run_in_threadpool(
+            TracebackService.get_source_context,
+            db, prefix=prefix, repos=repos, context=context,
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error retrieving source context: {str(e)}"
+        )
+
+
+@router.get("/{id}/source", response_model=dict)
+async def get_source_context_by_id(
+    id: int,
+    selection_id: Optional[str] = Query(None, description="Only resolve against this selection's repository"),
+    context: int = Query(10, ge=0, le=200, description="Lines of context around each frame"),
+    db: Session = Depends(get_db),
+):
+    """
+    Endpoint to retrieve the repository files and line windows referenced by
+    the stack traces of a log file
+    """
+    try:
+        if db.query(LogFile.id).filter(LogFile.id == id).first() is None:
+            raise HTTPException(status_code=404, detail=f"Log with id {id} not found")
+        repos = selection_repos(selection_id, db)
+        return await run_in_threadpool(
+            TracebackService.get_source_context,
+            db, log_id=id, repos=repos, context=context,
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error retrieving source context: {str(e)}"
+        )
+
+
 @router.get("/{id}", response_model=dict)
 async def get_log_by_id(id: int, db: Session = Depends(get_db)):
     """
@@ -77,6 +196,8 @@ async def delete_all_logs(db: Session = Depends(get_db)):
     Endpoint to delete all log files from the database
     """
     try:
+        db.query(LogFrame).delete()
+        db.query(LogFrameScan).delete()
         db.query(LogFile).delete()
         db.commit()
         return {"message": "All log files deleted successfully"}
@@ -109,6 +230,8 @@ async def delete_log_by_id(id: int, db: Session = Depends(get_db)):
     Endpoint to delete a log file by its id
     """
     try:
+        db.query(LogFrame).filter(LogFrame.log_id == id).delete()
+        db.query(LogFrameScan).filter(LogFrameScan.log_id == id).delete()
         db.query(LogFile).filter(LogFile.id == id).delete()
         db.commit()
         return {"message": f"Log file with id {id} deleted successfully"}
@@ -125,7 +248,7 @@ async def upload_json_logs(logs: List[LogInput], db: Session = Depends(get_db)):
     """
     try:
         for log in logs:
-            new_log = LogFile(filename=log.filename, content=log.content)
+            new_log = LogService.build_log_file(log.filename, log.content)
             db.add(new_log)
         db.commit()
         return {"message": f"{len(logs)} logs uploaded successfully."}
@@ -180,7 +303,7 @@ async def sync_sentry_logs(db: Session = Depends(get_db)):
                 content = json.dumps(event, indent=2)
 
                 # Save to database
-                log_file = LogFile(filename=filename, content=content)
+                log_file = LogService.build_log_file(filename, content)
                 db.add(log_file)
                 saved_files.append(filename)
 
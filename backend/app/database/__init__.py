@@ -7,7 +7,11 @@ from app.config import DATABASE_URL
 from .models import Base
 
 # Create synchronous engine for SQLite
-engine = create_engine(DATABASE_URL, echo=True)
+# Sessions are used from threadpool threads (sync dependencies, uploads run
+# off the event loop), so don't pin SQLite connections to their creating thread
+engine = create_engine(
+    DATABASE_URL, echo=True, connect_args={"check_same_thread": False}
+)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,5 +1,17 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text, JSON
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 
@@ -14,6 +26,27 @@ class LogFile(Base):
     content = Column(Text)
     created_at = Column(DateTime, default=func.now())
 
+    frames = relationship("LogFrame", cascade="all, delete-orphan")
+    frame_scan = relationship("LogFrameScan", uselist=False, cascade="all, delete-orphan")
+
+
+class LogFrame(Base):
+    """A source location referenced by a stack trace inside a log file"""
+    __tablename__ = "log_frames"
+
+    id = Column(Integer, primary_key=True, index=True)
+    log_id = Column(Integer, ForeignKey("log_files.id"), index=True, nullable=False)
+    path = Column(String, nullable=False)  # As written in the trace, normalized to "/"
+    line = Column(Integer, nullable=False)
+    function = Column(String, nullable=True)
+
+
+class LogFrameScan(Base):
+    """Marks a log file whose stack trace frames have been extracted, even if it had none"""
+    __tablename__ = "log_frame_scans"
+
+    log_id = Column(Integer, ForeignKey("log_files.id"), primary_key=True)
+
 
 class GitHubSelection(Base):
     __tablename__ = "github_selections"
@@ -23,3 +56,26 @@ class GitHubSelection(Base):
     url = Column(String, nullable=False)
     selected_files = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class GitHubSelectionEntry(Base):
+    __tablename__ = "github_selection_entries"
+    __table_args__ = (
+        UniqueConstraint("selection_id", "kind", "path"),
+        Index("ix_github_selection_entries_selection_path", "selection_id", "path"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    selection_id = Column(String, ForeignKey("github_selections.id"), index=True, nullable=False)
+    path = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="file")  # "file", "pattern", "exclude" or "match"
+
+
+class GitHubRepoTree(Base):
+    __tablename__ = "github_repo_trees"
+
+    repo = Column(String, primary_key=True)  # "owner/repo"
+    sha = Column(String)
+    paths = Column(JSON)  # Paths of all blobs in the tree
+    truncated = Column(Boolean, default=False)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
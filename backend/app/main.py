@@ -3,7 +3,9 @@ from pathlib import Path
 
 from app.controllers.github_controller import router as github_router
 from app.controllers.log_controller import router as log_router
+from app.config import INGEST_WORKERS
 from app.database import init_db
+from app.services.ingest_service import shutdown_pool, start_pool
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -42,6 +44,13 @@ app.include_router(github_router, prefix="/api/github", tags=["github"])
 @app.on_event("startup")
 def startup():
     init_db()
+    if INGEST_WORKERS > 1:
+        start_pool(INGEST_WORKERS)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    shutdown_pool()
 
 
 @app.get("/")
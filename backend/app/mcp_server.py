@@ -0,0 +1,229 @@
+"""
+MCP server that reads logs and GitHub selections straight from the backend
+database, without going through the HTTP API.
+
+Run from the backend directory:
+    python -m app.mcp_server
+"""
+import json
+import os
+import sys
+from datetime import datetime
+from io import TextIOWrapper
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+import httpx
+from mcp.server.fastmcp import FastMCP
+from mcp.server.stdio import stdio_server
+
+from app.database import SessionLocal, init_db
+from app.database.models import GitHubSelection, LogFile
+from app.services.log_service import LogService
+from app.services.prompt_service import PromptService, truncate
+from app.services.selection_service import SelectionService
+from app.services.traceback_service import TracebackService
+
+# Hard caps so a single tool call can't flood the model's context
+MAX_LOGS_PER_CALL = 50
+MAX_FILES_PER_CALL = 50
+MAX_RESPONSE_CHARS = 200_000
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
+
+github_headers = {
+    "Accept": "application/vnd.github.raw+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+}
+if GITHUB_TOKEN:
+    github_headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+
+mcp = FastMCP("Log & GitHub Retrieval MCP")
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid ISO 8601 date: {value}")
+
+
+@mcp.tool()
+def get_latest_logs(count: int = 1, max_chars_per_log: int = 20_000) -> str:
+    """Get the most recently uploaded log files, newest last."""
+    count = max(1, min(count, MAX_LOGS_PER_CALL))
+    with SessionLocal() as db:
+        logs = db.query(LogFile).order_by(LogFile.id.desc()).limit(count).all()
+        if not logs:
+            return "No logs found."
+        # Apply the size limit newest first so it drops the oldest logs, then
+        # show the ones that fit in upload order
+        _, oldest_id = PromptService.logs_prompt(logs, max_chars_per_log, MAX_RESPONSE_CHARS)
+        kept = [log for log in logs if log.id >= oldest_id]
+        prompt, _ = PromptService.logs_prompt(
+            reversed(kept), max_chars_per_log, MAX_RESPONSE_CHARS
+        )
+        left_out = [str(log.id) for log in reversed(logs) if log.id < oldest_id]
+        if left_out:
+            prompt += (
+                f"\n\n[size limit reached: older logs {', '.join(left_out)} were left out, "
+                f"read them with get_log]"
+            )
+        return prompt
+
+
+@mcp.tool()
+def get_log(log_id: int, offset: int = 0, max_chars: int = 20_000) -> str:
+    """
+    Get a log file by its ID. Large logs are returned in pieces; pass the
+    offset from the previous answer to continue.
+    """
+    max_chars = max(1, min(max_chars, MAX_RESPONSE_CHARS))
+    with SessionLocal() as db:
+        log = db.query(LogFile).filter(LogFile.id == log_id).first()
+        if log is None:
+            return f"Log with ID {log_id} not found."
+        return PromptService.log_block(log, max(0, offset), max_chars)
+
+
+@mcp.tool()
+def search_logs(
+    search: Optional[str] = None,
+    prefix: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 10,
+    max_chars_per_log: int = 5_000,
+) -> str:
+    """
+    Find logs whose content contains `search`, whose filename starts with `prefix`
+    and that were created between `since` and `until` (ISO 8601). Results are
+    ordered by id; pass the returned next_after_id as `after_id` for the next page.
+    """
+    limit = max(1, min(limit, MAX_LOGS_PER_CALL))
+    with SessionLocal() as db:
+        query = LogService.filter_logs(
+            db,
+            prefix=prefix,
+            since=_parse_datetime(since),
+            until=_parse_datetime(until),
+            search=search,
+            after_id=after_id,
+        )
+        logs = query.limit(limit + 1).all()
+        if not logs:
+            return "No matching logs found."
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        prompt, last_id = PromptService.logs_prompt(logs, max_chars_per_log, MAX_RESPONSE_CHARS)
+        # The size limit may have cut the page short; continue after the last
+        # log actually included so none are skipped
+        if has_more or last_id != logs[-1].id:
+            prompt += f"\n\nMore logs match: next_after_id={last_id}"
+        return prompt
+
+
+@mcp.tool()
+def get_selection_files(
+    selection_id: str,
+    after: Optional[str] = None,
+    limit: int = 20,
+    include_content: bool = True,
+    max_chars_per_file: int = 20_000,
+) -> str:
+    """
+    Get a page of the files in a saved GitHub selection, with their contents
+    fetched from GitHub unless include_content is false. Pass the returned
+    next_after as `after` for the next page.
+    """
+    limit = max(1, min(limit, MAX_FILES_PER_CALL))
+    with SessionLocal() as db:
+        selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
+        if selection is None:
+            return f"GitHub selection with ID {selection_id} not found."
+        SelectionService.migrate_legacy_selection(selection, db)
+        paths, has_more = SelectionService.get_files_page(selection, after, limit, db)
+        name = selection.name
+
+    if not paths:
+        return f"No files selected in {name}."
+
+    footer = f"\n\nMore files selected: next_after={paths[-1]}" if has_more else ""
+    if not include_content:
+        return f"Selected files in {name}:\n  - " + "\n  - ".join(paths) + footer
+
+    files = []
+    budget = MAX_RESPONSE_CHARS
+    with httpx.Client(headers=github_headers, timeout=30) as client:
+        for path in paths:
+            if budget <= 0:
+                files.append((path, "[size limit reached: request this file on its own]"))
+                continue
+            try:
+                response = client.get(f"{GITHUB_API_URL}/repos/{name}/contents/{quote(path)}")
+                response.raise_for_status()
+                content, next_offset = truncate(response.text, 0, min(max_chars_per_file, budget))
+                if next_offset is not None:
+                    content += f"\n[truncated: {len(response.text) - next_offset} more characters]"
+            except httpx.HTTPError as e:
+                content = f"[could not fetch file: {e}]"
+            files.append((path, content))
+            budget -= len(content)
+
+    return PromptService.selection_prompt(name, files) + footer
+
+
+@mcp.tool()
+def get_log_source_context(
+    log_id: int, selection_id: Optional[str] = None, context: int = 10
+) -> str:
+    """
+    Get the repository files and line windows referenced by the stack traces in a
+    log, optionally only from the repository of one GitHub selection.
+    """
+    with SessionLocal() as db:
+        if db.query(LogFile.id).filter(LogFile.id == log_id).first() is None:
+            return f"Log with ID {log_id} not found."
+        repos = None
+        if selection_id is not None:
+            selection = db.query(GitHubSelection).filter(GitHubSelection.id == selection_id).first()
+            if selection is None:
+                return f"GitHub selection with ID {selection_id} not found."
+            repos = [selection.name]
+        result = TracebackService.get_source_context(
+            db, log_id=log_id, repos=repos, context=max(0, min(context, 200))
+        )
+    return json.dumps(result, indent=2)
+
+
+async def _run_stdio(protocol_out):
+    # Same as FastMCP.run_stdio_async, but with our own stdout stream, which
+    # that method doesn't accept. _mcp_server is FastMCP's private low-level
+    # Server; this relies on its layout in mcp==1.4.1 (pinned in requirements.txt)
+    # and must be rechecked when upgrading mcp.
+    stdout = anyio.wrap_file(TextIOWrapper(protocol_out, encoding="utf-8"))
+    async with stdio_server(stdout=stdout) as (read_stream, write_stream):
+        await mcp._mcp_server.run(
+            read_stream, write_stream, mcp._mcp_server.create_initialization_options()
+        )
+
+
+def main():
+    # stdout carries the MCP protocol. The backend prints progress and SQL echo
+    # to stdout, so keep the protocol on a copy of the descriptor and point
+    # everything else at stderr.
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    init_db()
+    anyio.run(_run_stdio, protocol_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import json
+import posixpath
+import struct
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.database.models import LogFile
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+# Logs read from the database per transaction
+_BATCH_SIZE = 100
+# Size of the pieces log content is written to the zip stream in
+_CHUNK_SIZE = 64 * 1024
+
+MANIFEST_NAME = "export-manifest.json"
+
+# Extra field ("LG" + 8 byte log id) stored in every entry's local header, which
+# is written before the entry's data and so survives a cut-off download
+LOG_ID_EXTRA_TAG = 0x474C
+_LOCAL_HEADER = struct.Struct("<4s5HLLLHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+
+
+class _StreamBuffer:
+    """
+    Write-only, unseekable file object that zipfile writes into. The bytes
+    are handed to the response after every write so nothing piles up.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _log_id_extra(log_id: int) -> bytes:
+    return struct.pack("<HHQ", LOG_ID_EXTRA_TAG, 8, log_id)
+
+
+def _read_log_id(extra: bytes) -> Optional[int]:
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, i)
+        if tag == LOG_ID_EXTRA_TAG and size == 8 and i + 12 <= len(extra):
+            return struct.unpack_from("<Q", extra, i + 4)[0]
+        i += 4 + size
+    return None
+
+
+def resume_after_id(data: bytes) -> Optional[int]:
+    """
+    Find the after_id to resume a zip export from, given the bytes received
+    before the download was cut off. Entries are scanned through their local
+    headers. The last entry found may be incomplete, so the export resumes
+    after the entry before it unless the archive's central directory was
+    reached. Returns None when the export has to start over.
+    """
+    ids = []
+    complete = False
+    pos = data.find(_LOCAL_HEADER_SIGNATURE)
+    while pos != -1 and pos + _LOCAL_HEADER.size <= len(data):
+        fields = _LOCAL_HEADER.unpack_from(data, pos)
+        name_len, extra_len = fields[-2], fields[-1]
+        extra_start = pos + _LOCAL_HEADER.size + name_len
+        log_id = _read_log_id(data[extra_start:extra_start + extra_len])
+        # Ids only go up; anything else is a signature inside compressed data
+        if log_id is not None and (not ids or log_id > ids[-1]):
+            ids.append(log_id)
+            pos = extra_start + extra_len
+        else:
+            pos += 1
+        next_local = data.find(_LOCAL_HEADER_SIGNATURE, pos)
+        central = data.find(_CENTRAL_HEADER_SIGNATURE, pos)
+        if central != -1 and (next_local == -1 or central < next_local):
+            complete = True
+            break
+        pos = next_local
+
+    if complete and ids:
+        return ids[-1]
+    return ids[-2] if len(ids) >= 2 else None
+
+def _archive_name(filename: str, log_id: int, first_id: Optional[int]) -> str:
+    # Stored names are "zip_name/path/in/zip"; keep that layout but never
+    # let a name escape the archive root
+    name = posixpath.normpath((filename or "").replace("\\", "/")).lstrip("/")
+    if not name or name == "." or name.startswith(".."):
+        return f"log_{log_id}.txt"
+    # Same file uploaded more than once: the first upload keeps the name and
+    # later ones get their id appended. A name changed above could clash with
+    # a stored one, so it gets the id as well.
+    if first_id != log_id or name != filename:
+        root, ext = posixpath.splitext(name)
+        name = f"{root}.{log_id}{ext}"
+    return name
+
+
+def _first_ids(session: Session, filenames: Iterable[str]) -> Dict[str, int]:
+    """
+    Lowest log id stored under each of the filenames. Looked up per batch so
+    the export doesn't have to remember every name it has written.
+    """
+    filenames = list({name for name in filenames if name})
+    if not filenames:
+        return {}
+    rows = (
+        session.query(LogFile.filename, func.min(LogFile.id))
+        .filter(LogFile.filename.in_(filenames))
+        .group_by(LogFile.filename)
+        .all()
+    )
+    session.rollback()
+    return dict(rows)
+
+
+def _iter_batches(query: Query) -> Iterator[List]:
+    """
+    Read the logs of a query ordered by id in keyset batches. Each batch is
+    its own short read, and the transaction is ended before the rows are
+    handed out. SQLite isn't in WAL mode, so a read kept open while a slow
+    client downloads would lock out every writer.
+    """
+    session = query.session
+    query = query.with_entities(LogFile.id, LogFile.filename, LogFile.created_at, LogFile.content)
+    last_id = None
+    while True:
+        batch = query if last_id is None else query.filter(LogFile.id > last_id)
+        rows = batch.limit(_BATCH_SIZE).all()
+        session.rollback()
+        if rows:
+            yield rows
+        if len(rows) < _BATCH_SIZE:
+            return
+        last_id = rows[-1].id
+
+
+class ExportService:
+    @staticmethod
+    def iter_ndjson(query: Query) -> Iterator[bytes]:
+        """
+        Stream the logs of the query (ordered by id) as newline-delimited JSON,
+        one log per line
+        """
+        for batch in _iter_batches(query):
+            for log in batch:
+                record = {
+                    "id": log.id,
+                    "filename": log.filename,
+                    "created_at": log.created_at.isoformat() if log.created_at else None,
+                    "content": log.content,
+                }
+                yield (json.dumps(record) + "\n").encode("utf-8")
+
+    @staticmethod
+    def iter_zip(query: Query) -> Iterator[bytes]:
+        """
+        Stream the logs of the query (ordered by id) as a zip archive using
+        their stored filenames as paths. The log id is written to each entry's
+        local header (see resume_after_id) and comment, and a final manifest
+        records the last exported id. An interrupted export is resumed by
+        passing resume_after_id(received_bytes) as after_id; names don't
+        depend on where the export started, so a resumed archive fits the
+        partial one.
+        """
+        buffer = _StreamBuffer()
+        count = 0
+        last_id = None
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_ref:
+            for batch in _iter_batches(query):
+                first_ids = _first_ids(query.session, (log.filename for log in batch))
+                for log in batch:
+                    name = _archive_name(log.filename, log.id, first_ids.get(log.filename))
+
+                    info = zipfile.ZipInfo(name)
+                    if log.created_at:
+                        info.date_time = log.created_at.timetuple()[:6]
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    info.comment = str(log.id).encode()
+                    info.extra = _log_id_extra(log.id)
+
+                    content = (log.content or "").encode("utf-8")
+                    with zip_ref.open(info, "w") as entry:
+                        for i in range(0, len(content), _CHUNK_SIZE):
+                            entry.write(content[i:i + _CHUNK_SIZE])
+                            yield buffer.drain()
+                    yield buffer.drain()
+
+                    count += 1
+                    last_id = log.id
+
+            manifest = {"count": count, "last_id": last_id}
+            zip_ref.writestr(MANIFEST_NAME, json.dumps(manifest))
+        yield buffer.drain()
@@ -0,0 +1,168 @@
+import codecs
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from app.services.traceback_service import Frame, extract_frames
+
+# Byte order marks we can sniff, longest first so UTF-32 is not mistaken for UTF-16
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Only this many bytes are inspected when guessing BOM-less UTF-16
+_SNIFF_BYTES = 4096
+
+# Members are sent to the workers in batches of roughly this many uncompressed bytes
+_BATCH_BYTES = 4 * 1024 * 1024
+
+# Process pool shared by every upload, see start_pool
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def detect_encoding(raw: bytes) -> str:
+    """
+    Guess the encoding of a log file: BOM first, then strict UTF-8,
+    then BOM-less UTF-16 (lots of NUL bytes on one side), then Latin-1
+    """
+    for bom, encoding in _BOMS:
+        if raw.startswith(bom):
+            return encoding
+
+    try:
+        raw.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    sample = raw[:_SNIFF_BYTES]
+    if len(sample) >= 2:
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+            return "utf-16-le"
+        if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+            return "utf-16-be"
+
+    # Latin-1 maps every byte, so this never loses data
+    return "latin-1"
+
+
+def preprocess_content(text: str) -> str:
+    """
+    Normalize decoded log text before it is stored
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    if "\x00" in text:
+        text = text.replace("\x00", "")
+    return text
+
+
+def decode_content(raw: bytes) -> str:
+    """
+    Decode raw file bytes with the detected encoding and preprocess the result
+    """
+    encoding = detect_encoding(raw)
+    return preprocess_content(raw.decode(encoding, errors="replace"))
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Start the ingest process pool if it isn't running yet and return it.
+    Workers are spawned rather than forked so they don't inherit the
+    server's threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _load_member(zip_ref: zipfile.ZipFile, member: str) -> Tuple[str, List[Frame]]:
+    with zip_ref.open(member) as file:
+        content = decode_content(file.read())
+    return content, extract_frames(content)
+
+
+def _load_batch(zip_path: str, members: List[str]) -> List[Tuple[str, List[Frame]]]:
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        return [_load_member(zip_ref, member) for member in members]
+
+
+def _batches(zip_path: str, members: List[str]) -> Iterator[List[str]]:
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        sizes = {info.filename: info.file_size for info in zip_ref.infolist()}
+    batch = []
+    batch_bytes = 0
+    for member in members:
+        batch.append(member)
+        batch_bytes += sizes.get(member, 0)
+        if batch_bytes >= _BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def iter_zip_members(
+    zip_path: str,
+    members: List[str],
+    executor: Optional[Executor] = None,
+    max_in_flight: int = 4,
+) -> Iterator[Tuple[str, str, List[Frame]]]:
+    """
+    Decompress, decode and extract stack frames from the given zip members,
+    yielding (member, content, frames) in the same order as `members`. With an
+    executor the members are handled in batches by its workers so the caller
+    can keep writing to the database while the remaining members are decoded.
+    At most `max_in_flight` batches are queued or waiting to be consumed, so
+    decoded content doesn't pile up when the caller is the slower side.
+    """
+    if executor is None or len(members) <= 1:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            for member in members:
+                content, frames = _load_member(zip_ref, member)
+                yield member, content, frames
+        return
+
+    pending = deque()
+    batches = _batches(zip_path, members)
+    for batch in batches:
+        pending.append((batch, executor.submit(_load_batch, zip_path, batch)))
+        if len(pending) >= max_in_flight:
+            break
+
+    try:
+        while pending:
+            batch, future = pending.popleft()
+            results = future.result()
+            next_batch = next(batches, None)
+            if next_batch is not None:
+                pending.append((next_batch, executor.submit(_load_batch, zip_path, next_batch)))
+            for member, (content, frames) in zip(batch, results):
+                yield member, content, frames
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -1,11 +1,18 @@
 import os
+import tempfile
 import zipfile
-import shutil
 
-from app.config import TEMP_DIR
-from app.database.models import LogFile
+from app.config import INGEST_PARALLEL_MIN_BYTES, INGEST_WORKERS, TEMP_DIR
+from app.database.models import LogFile, LogFrameScan
+from app.services.ingest_service import decode_content, iter_zip_members, start_pool
+from app.services.traceback_service import build_frames, extract_frames
 from sqlalchemy.orm import Session
 
+# Decoded content written per transaction while importing an archive. The
+# session is committed and cleared after each batch so a large archive never
+# sits in memory as a whole.
+_COMMIT_BATCH_BYTES = 16 * 1024 * 1024
+
 
 class LogService:
     @staticmethod
@@ -21,11 +28,11 @@ class LogService:
 
         # Process as a regular file
         try:
-            # Decode content assuming it's text
-            content = file_content.decode("utf-8", errors="ignore")
+            # Decode content using the detected encoding
+            content = decode_content(file_content)
 
             # Create log file entry
-            log_file = LogFile(filename=filename, content=content)
+            log_file = LogService.build_log_file(filename, content)
 
             print(f"Adding log file to database: {log_file.filename}")
             db.add(log_file)
@@ -37,15 +44,21 @@ class LogService:
             raise e
 
     @staticmethod
-    def process_zip_file(zip_file, zip_filename=None, db: Session=None):
+    def process_zip_file(zip_file, zip_filename=None, db: Session=None, workers=None):
         """
-        Extract txt files from the zip and save their contents to the database
+        Extract txt files from the zip and save their contents to the database.
+        Files are committed in batches, so when the import fails part way the
+        files committed before the failure stay in the database.
         """
-        # Create a temporary file to save the uploaded zip
-        temp_zip_path = os.path.join(TEMP_DIR, "temp.zip")
+        if workers is None:
+            workers = INGEST_WORKERS
+
+        # Create a temporary file to save the uploaded zip. Each upload gets its
+        # own file so concurrent uploads don't overwrite each other.
+        fd, temp_zip_path = tempfile.mkstemp(suffix=".zip", dir=TEMP_DIR)
 
         print(f"Creating temporary zip file at: {temp_zip_path}")
-        with open(temp_zip_path, "wb") as f:
+        with os.fdopen(fd, "wb") as f:
             f.write(zip_file)
 
         saved_files = []
@@ -59,12 +72,15 @@ class LogService:
         else:
             print("Warning: No zip filename provided, files will be stored without folder prefix")
 
-        print("Opening zip file for extraction")
-        # Extract all txt files
-        with zipfile.ZipFile(temp_zip_path, "r") as zip_ref:
-            file_list = zip_ref.infolist()
+        try:
+            print("Opening zip file for extraction")
+            with zipfile.ZipFile(temp_zip_path, "r") as zip_ref:
+                file_list = zip_ref.infolist()
             print(f"Found {len(file_list)} files in zip archive")
 
+            members = []
+            prefixed_names = {}
+            total_size = 0
             for file_info in file_list:
                 # Skip files with no name or that start with .
                 original_filename = file_info.filename
@@ -73,45 +89,113 @@ class LogService:
                     print(f"Skipping file: {original_filename} (no name or starts with .)")
                     continue
 
-                # Check if the file already has a folder structure
-                # Don't add additional prefix if it does
-                if '/' in original_filename and zip_name:
-                    parts = original_filename.split('/')
-                    if parts[0] == zip_name:
-                        # This file is already prefixed with the same zip name
-                        prefixed_filename = original_filename
-                        print(f"File already has correct prefix: {prefixed_filename}")
-                    else:
-                        # File has some other structure, preserve it under this zip name
-                        prefixed_filename = f"{zip_name}/{original_filename}"
-                        print(f"Adding prefix to existing structure: {prefixed_filename}")
-                else:
-                    # Create a prefixed filename with the zip name if needed
-                    prefixed_filename = original_filename
-                    if zip_name:
-                        prefixed_filename = f"{zip_name}/{basename}"
-                        print(f"Adding prefix to file: {prefixed_filename}")
-
-                # Process all valid files
-                print(f"Processing file: {prefixed_filename}")
-                with zip_ref.open(original_filename) as file:
-                    content = file.read().decode("utf-8", errors="ignore")
-
-                log_file = LogFile(
-                    filename=prefixed_filename, content=content
+                members.append(original_filename)
+                prefixed_names[original_filename] = LogService.prefixed_filename(
+                    original_filename, zip_name
+                )
+                total_size += file_info.file_size
+
+            # Small archives aren't worth the round trip to the worker processes
+            executor = None
+            if workers > 1 and total_size >= INGEST_PARALLEL_MIN_BYTES:
+                executor = start_pool(workers)
+            print(f"Decoding {len(members)} files {'in the worker pool' if executor else 'inline'}")
+
+            # Members are decompressed, decoded and scanned for stack frames by the
+            # workers and come back in archive order; this thread is the only one
+            # writing to the db
+            pending_bytes = 0
+            for original_filename, content, frames in iter_zip_members(
+                temp_zip_path, members, executor, max_in_flight=2 * workers
+            ):
+                log_file = LogService.build_log_file(
+                    prefixed_names[original_filename], content, frames
                 )
 
                 print(f"Adding log file to database: {log_file.filename}")
                 db.add(log_file)
-                saved_files.append(prefixed_filename)
+                saved_files.append(log_file.filename)
 
-        print(f"Committing {len(saved_files)} log files to database")
-        db.commit()
+                pending_bytes += len(content)
+                if pending_bytes >= _COMMIT_BATCH_BYTES:
+                    LogService._commit_batch(db)
+                    pending_bytes = 0
 
-        os.remove(temp_zip_path)
+            print(f"Committing {len(saved_files)} log files to database")
+            LogService._commit_batch(db)
+        finally:
+            os.remove(temp_zip_path)
 
         return saved_files
 
+    @staticmethod
+    def _commit_batch(db: Session):
+        # Drop the committed rows from the session as well, otherwise it keeps
+        # every file of the archive until the request ends
+        db.commit()
+        db.expunge_all()
+
+    @staticmethod
+    def build_log_file(filename, content, frames=None):
+        """
+        Create a log file entry together with the index of its stack trace frames
+        """
+        if frames is None:
+            frames = extract_frames(content)
+        return LogFile(
+            filename=filename,
+            content=content,
+            frames=build_frames(frames),
+            frame_scan=LogFrameScan(),
+        )
+
+    @staticmethod
+    def prefixed_filename(original_filename, zip_name):
+        """
+        Build the stored filename for a zip member, grouping it under the zip name
+        """
+        basename = os.path.basename(original_filename)
+
+        # Check if the file already has a folder structure
+        # Don't add additional prefix if it does
+        if '/' in original_filename and zip_name:
+            parts = original_filename.split('/')
+            if parts[0] == zip_name:
+                # This file is already prefixed with the same zip name
+                return original_filename
+            # File has some other structure, preserve it under this zip name
+            return f"{zip_name}/{original_filename}"
+
+        # Create a prefixed filename with the zip name if needed
+        if zip_name:
+            return f"{zip_name}/{basename}"
+        return original_filename
+
+    @staticmethod
+    def filter_logs(
+        db: Session,
+        prefix=None,
+        since=None,
+        until=None,
+        search=None,
+        after_id=None,
+    ):
+        """
+        Build a query for log files matching the given filters, ordered by id
+        """
+        query = db.query(LogFile)
+        if prefix:
+            query = query.filter(LogFile.filename.startswith(prefix, autoescape=True))
+        if since is not None:
+            query = query.filter(LogFile.created_at >= since)
+        if until is not None:
+            query = query.filter(LogFile.created_at < until)
+        if search:
+            query = query.filter(LogFile.content.contains(search, autoescape=True))
+        if after_id is not None:
+            query = query.filter(LogFile.id > after_id)
+        return query.order_by(LogFile.id)
+
     @staticmethod
     def get_all_logs(db: Session):
         """
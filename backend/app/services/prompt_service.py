@@ -0,0 +1,107 @@
+from typing import Iterable, List, Optional, Tuple
+
+from app.database.models import LogFile
+
+LOG_PROMPT_HEADER = [
+    "You are an expert data engineer.",
+    "I will provide you with several logs from different files.",
+    "Your task is to analyze them and identify any issues or suggest improvements based on the content.",
+    "",
+    "Each log has the following structure:",
+    "- id: a numeric identifier for the file",
+    "- filename: the name of the file",
+    "- content: the actual log or data from the file",
+    "",
+    "You might receive multiple files at once. Please analyze **all of them** before responding.",
+    "Here are the logs:\n",
+]
+
+# Room left for a log block's markers and truncation note when cutting it to size
+_BLOCK_OVERHEAD = 500
+
+SELECTION_PROMPT_HEADER = [
+    "You are an expert software engineer.",
+    "I will provide you with files from a saved GitHub repository selection.",
+    "Your task is to understand the context provided by the selected files from this repository.",
+    "Here are the files:\n",
+]
+
+
+def truncate(text: str, offset: int, max_chars: int) -> Tuple[str, Optional[int]]:
+    """
+    Cut `max_chars` characters out of `text` starting at `offset`.
+    Returns the slice and the offset to continue from, or None when nothing is left.
+    """
+    end = offset + max_chars
+    if end >= len(text):
+        return text[offset:], None
+    return text[offset:end], end
+
+
+class PromptService:
+    @staticmethod
+    def log_block(log: LogFile, offset: int = 0, max_chars: Optional[int] = None) -> str:
+        content = log.content or ""
+        next_offset = None
+        if max_chars is not None:
+            content, next_offset = truncate(content, offset, max_chars)
+        block = (
+            f"\n--- LOG START ---\n"
+            f"id: {log.id}\n"
+            f"filename: {log.filename}\n"
+            f"content:\n{content}\n"
+        )
+        if next_offset is not None:
+            block += (
+                f"[truncated: {len(log.content) - next_offset} more characters, "
+                f"continue from offset {next_offset}]\n"
+            )
+        return block + "--- LOG END ---"
+
+    @staticmethod
+    def logs_prompt(
+        logs: Iterable[LogFile],
+        max_chars_per_log: Optional[int] = None,
+        max_total_chars: Optional[int] = None,
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Format logs for the model, stopping before the total size limit is exceeded.
+        Returns the prompt and the id of the last log included, which is the
+        cursor to continue from when not every log fit.
+        """
+        prompt = list(LOG_PROMPT_HEADER)
+        total = 0
+        last_id = None
+        for log in logs:
+            block = PromptService.log_block(log, max_chars=max_chars_per_log)
+            if max_total_chars is not None and total + len(block) > max_total_chars:
+                if last_id is not None:
+                    prompt.append(
+                        f"\n[size limit reached: logs from id {log.id} on were left out]"
+                    )
+                    break
+                # Never come back empty-handed: cut the first log down to the budget
+                limit = max(1, max_total_chars - _BLOCK_OVERHEAD)
+                if max_chars_per_log is not None:
+                    limit = min(limit, max_chars_per_log)
+                block = PromptService.log_block(log, max_chars=limit)
+            prompt.append(block)
+            total += len(block)
+            last_id = log.id
+        return "\n".join(prompt), last_id
+
+    @staticmethod
+    def selection_prompt(name: str, files: List[Tuple[str, str]]) -> str:
+        """
+        Format (path, content) pairs of a repository selection for the model
+        """
+        prompt = list(SELECTION_PROMPT_HEADER)
+        for path, content in files:
+            prompt.append(
+                f"\n--- FILE START ---\n"
+                f"repository: {name}\n"
+                f"path: {path}\n"
+                f"content:\n{content}\n"
+                f"--- FILE END ---"
+            )
+        return "\n".join(prompt)
@@ -0,0 +1,293 @@
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.database.models import GitHubRepoTree, GitHubSelection, GitHubSelectionEntry
+from sqlalchemy import delete, exists, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+
+FILE = "file"  # Explicitly selected file
+PATTERN = "pattern"  # Glob or directory pattern
+EXCLUDE = "exclude"  # File deselected even though a pattern matches it
+MATCH = "match"  # File matched by a pattern in the cached tree, derived from the patterns
+
+# Stay well below SQLite's limit on bound parameters per statement
+_CHUNK_SIZE = 500
+
+
+def _chunks(items: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(items), _CHUNK_SIZE):
+        yield items[i:i + _CHUNK_SIZE]
+
+
+@lru_cache(maxsize=256)
+def _pattern_regex(pattern: str):
+    """
+    Compile a selection pattern. A trailing "/" selects a whole directory,
+    "*" and "?" match within a path segment and "**" matches across segments.
+    """
+    if pattern.endswith("/"):
+        return re.compile(re.escape(pattern) + ".*")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex)
+
+
+class SelectionService:
+    @staticmethod
+    def migrate_legacy_selection(selection: GitHubSelection, db: Session):
+        """
+        Move a selection stored in the legacy selected_files JSON array into
+        the entries table
+        """
+        if not selection.selected_files:
+            return
+
+        print(f"Migrating {len(selection.selected_files)} legacy selected files for {selection.id}")
+        SelectionService.add_entries(selection.id, selection.selected_files, FILE, db)
+        selection.selected_files = None
+        db.commit()
+
+    @staticmethod
+    def add_entries(selection_id: str, paths: Iterable[str], kind: str, db: Session) -> int:
+        """
+        Insert entries that aren't in the selection yet, returns how many were added
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        added = 0
+        for chunk in _chunks(paths):
+            statement = insert(GitHubSelectionEntry).on_conflict_do_nothing()
+            # Core execution so rowcount reports the rows actually inserted
+            result = db.connection().execute(
+                statement,
+                [{"selection_id": selection_id, "path": path, "kind": kind} for path in chunk],
+            )
+            added += max(result.rowcount, 0)
+        return added
+
+    @staticmethod
+    def remove_entries(selection_id: str, paths: Iterable[str], kind: str, db: Session) -> int:
+        """
+        Delete the given entries from the selection, returns how many were removed
+        """
+        paths = list(dict.fromkeys(paths))
+        removed = 0
+        for chunk in _chunks(paths):
+            result = db.execute(
+                delete(GitHubSelectionEntry).where(
+                    GitHubSelectionEntry.selection_id == selection_id,
+                    GitHubSelectionEntry.kind == kind,
+                    GitHubSelectionEntry.path.in_(chunk),
+                )
+            )
+            removed += result.rowcount
+        return removed
+
+    @staticmethod
+    def replace_files(selection_id: str, paths: List[str], db: Session):
+        """
+        Make the selection's explicit files equal to `paths`, only writing the
+        difference. Newly listed files are selected again even if excluded.
+        """
+        current = set(SelectionService.iter_entry_paths(selection_id, FILE, db))
+        wanted = set(paths)
+        added = sorted(wanted - current)
+        SelectionService.remove_entries(selection_id, sorted(current - wanted), FILE, db)
+        SelectionService.remove_entries(selection_id, added, EXCLUDE, db)
+        SelectionService.add_entries(selection_id, added, FILE, db)
+
+    @staticmethod
+    def count_entries(selection_id: str, kind: str, db: Session) -> int:
+        return (
+            db.query(func.count(GitHubSelectionEntry.id))
+            .filter(
+                GitHubSelectionEntry.selection_id == selection_id,
+                GitHubSelectionEntry.kind == kind,
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def iter_entry_paths(selection_id: str, kind: str, db: Session) -> Iterator[str]:
+        query = (
+            db.query(GitHubSelectionEntry.path)
+            .filter(
+                GitHubSelectionEntry.selection_id == selection_id,
+                GitHubSelectionEntry.kind == kind,
+            )
+            .order_by(GitHubSelectionEntry.path)
+            .yield_per(1000)
+        )
+        for (path,) in query:
+            yield path
+
+    @staticmethod
+    def get_entries_page(selection_id: str, offset: int, limit: int, db: Session):
+        """
+        One page of stored selection entries (files, patterns and exclusions),
+        ordered by kind and path
+        """
+        query = db.query(GitHubSelectionEntry).filter(
+            GitHubSelectionEntry.selection_id == selection_id,
+            GitHubSelectionEntry.kind != MATCH,
+        )
+        total = query.count()
+        items = (
+            query.order_by(GitHubSelectionEntry.kind, GitHubSelectionEntry.path)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        return items, total
+
+    @staticmethod
+    def get_cached_tree(repo: str, db: Session) -> Optional[GitHubRepoTree]:
+        return db.query(GitHubRepoTree).filter(GitHubRepoTree.repo == repo).first()
+
+    @staticmethod
+    def get_tree_status(repo: str, db: Session) -> Tuple[bool, bool]:
+        """
+        Whether the repository tree is cached and whether it was truncated,
+        without loading its paths
+        """
+        row = db.query(GitHubRepoTree.truncated).filter(GitHubRepoTree.repo == repo).first()
+        if row is None:
+            return False, False
+        return True, bool(row.truncated)
+
+    @staticmethod
+    def cache_tree(repo: str, tree: dict, db: Session):
+        """
+        Store the blob paths of a tree fetched from the GitHub API
+        """
+        paths = [node["path"] for node in tree.get("tree", []) if node.get("type") == "blob"]
+        cached = SelectionService.get_cached_tree(repo, db)
+        if cached is None:
+            cached = GitHubRepoTree(repo=repo)
+            db.add(cached)
+        changed = cached.sha != tree.get("sha")
+        cached.sha = tree.get("sha")
+        cached.paths = paths
+        cached.truncated = bool(tree.get("truncated"))
+        db.flush()
+
+        # Pattern matches are stored per tree, refresh them when the tree changes
+        if changed:
+            selections = db.query(GitHubSelection.id).filter(GitHubSelection.name == repo)
+            for (selection_id,) in selections.all():
+                SelectionService.expand_patterns(selection_id, repo, db)
+        db.commit()
+
+    @staticmethod
+    def match_patterns(patterns: List[str], paths: Iterable[str]) -> List[str]:
+        """
+        Sorted list of the paths matched by any of the patterns
+        """
+        regexes = [_pattern_regex(pattern) for pattern in patterns]
+        return sorted(p for p in paths if any(r.fullmatch(p) for r in regexes))
+
+    @staticmethod
+    def expand_patterns(selection_id: str, repo: str, db: Session, patterns: Optional[List[str]] = None):
+        """
+        Store the files matched by the selection's patterns in the cached tree as
+        match entries. Without `patterns` all matches are rebuilt; with them only
+        the matches of those (newly added) patterns are inserted.
+        """
+        if patterns is None:
+            db.execute(
+                delete(GitHubSelectionEntry).where(
+                    GitHubSelectionEntry.selection_id == selection_id,
+                    GitHubSelectionEntry.kind == MATCH,
+                )
+            )
+            patterns = list(SelectionService.iter_entry_paths(selection_id, PATTERN, db))
+        tree = SelectionService.get_cached_tree(repo, db)
+        if not patterns or tree is None:
+            return
+        matched = SelectionService.match_patterns(patterns, tree.paths or [])
+        SelectionService.add_entries(selection_id, matched, MATCH, db)
+
+    @staticmethod
+    def select_files(selection: GitHubSelection, paths: List[str], db: Session) -> int:
+        """
+        Add explicit files, lifting any exclusion on them
+        """
+        SelectionService.remove_entries(selection.id, paths, EXCLUDE, db)
+        return SelectionService.add_entries(selection.id, paths, FILE, db)
+
+    @staticmethod
+    def deselect_files(selection: GitHubSelection, paths: List[str], db: Session) -> int:
+        """
+        Remove files from the selection. Files that a pattern still matches get
+        an exclude entry so they stay deselected.
+        """
+        paths = list(dict.fromkeys(paths))
+        changed = SelectionService.remove_entries(selection.id, paths, FILE, db)
+        matched = []
+        for chunk in _chunks(paths):
+            matched += [
+                path
+                for (path,) in db.query(GitHubSelectionEntry.path).filter(
+                    GitHubSelectionEntry.selection_id == selection.id,
+                    GitHubSelectionEntry.kind == MATCH,
+                    GitHubSelectionEntry.path.in_(chunk),
+                )
+            ]
+        return changed + SelectionService.add_entries(selection.id, matched, EXCLUDE, db)
+
+    @staticmethod
+    def add_patterns(selection: GitHubSelection, patterns: List[str], db: Session) -> int:
+        added = SelectionService.add_entries(selection.id, patterns, PATTERN, db)
+        if added:
+            SelectionService.expand_patterns(selection.id, selection.name, db, patterns)
+        return added
+
+    @staticmethod
+    def remove_patterns(selection: GitHubSelection, patterns: List[str], db: Session) -> int:
+        removed = SelectionService.remove_entries(selection.id, patterns, PATTERN, db)
+        if removed:
+            # A file may also be matched by a remaining pattern, so rebuild
+            SelectionService.expand_patterns(selection.id, selection.name, db)
+        return removed
+
+    @staticmethod
+    def get_files_page(selection: GitHubSelection, after: Optional[str], limit: int, db: Session):
+        """
+        One page of the selected files (explicit files and pattern matches, minus
+        exclusions) in path order, starting after the path `after`. Returns the
+        files and whether more follow them.
+        """
+        entry = aliased(GitHubSelectionEntry)
+        excluded = aliased(GitHubSelectionEntry)
+        query = db.query(entry.path).filter(
+            entry.selection_id == selection.id,
+            entry.kind.in_([FILE, MATCH]),
+            ~exists().where(
+                excluded.selection_id == entry.selection_id,
+                excluded.kind == EXCLUDE,
+                excluded.path == entry.path,
+            ),
+        )
+        if after is not None:
+            query = query.filter(entry.path > after)
+        rows = query.distinct().order_by(entry.path).limit(limit + 1).all()
+        files = [path for (path,) in rows[:limit]]
+        return files, len(rows) > limit
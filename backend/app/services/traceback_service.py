@@ -0,0 +1,256 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.database.models import GitHubRepoTree, LogFile, LogFrame, LogFrameScan
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+# (path, line, function) as found in a stack trace
+Frame = Tuple[str, int, Optional[str]]
+
+# File "/app/src/api.py", line 42, in handler
+_PYTHON_FRAME = re.compile(r'File "([^"]+)", line (\d+)(?:, in ([^\s]+))?')
+# "    at handler (/app/src/api.js:42:13)" or "    at /app/src/api.js:42:13",
+# indented on a line of its own like every V8 stack frame
+_NODE_FRAME = re.compile(
+    r"^[ \t]+at (?:(?:async |new )?([^\s(]+) \(([^\s()]+?):(\d+)(?::\d+)?\)"
+    r"|([^\s()]+?):(\d+)(?::\d+)?)[ \t\r]*$",
+    re.MULTILINE,
+)
+# What a Node frame location has to look like: a directory or a source file
+_SOURCE_PATH = re.compile(r"[/\\]|\.(?:[cm]?js|jsx|tsx?|coffee)$")
+# at com.example.Api.handler(Api.java:42)
+_JAVA_FRAME = re.compile(r"\bat ([\w$.]+)\(([\w$-]+\.\w+):(\d+)\)")
+# Sentry event frames: "abs_path": "...", ..., "lineno": 42 in event payloads, or
+# "absPath": "...", ..., "lineNo": 42 in REST API events as stored by the Sentry sync
+_SENTRY_FRAME = re.compile(
+    r'"(?:abs_path|absPath|filename)":\s*"([^"]+)"[^{}]*?"(?:lineno|lineNo)":\s*(\d+)'
+)
+
+# Upper bound on unresolved frames echoed back to the caller
+_MAX_UNRESOLVED = 100
+
+# Frames from these locations never belong to the user's repository: installed
+# packages, the Python standard library ("/usr/lib/python3.11/...", "<frozen
+# ...>"), Node internals ("node:internal/...") and system libraries
+_IGNORED_PATHS = (
+    "site-packages/",
+    "dist-packages/",
+    "node_modules/",
+    "/lib/python",
+    "/usr/lib/",
+    "/usr/local/lib/",
+    "<",
+    "node:",
+)
+
+
+def _is_ignored(path: str) -> bool:
+    return any(ignored in path for ignored in _IGNORED_PATHS)
+
+
+def _normalize_path(path: str) -> str:
+    path = path.replace("\\", "/")
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    if path.startswith("webpack://"):
+        path = path[len("webpack://"):]
+    return path
+
+
+def _java_path(qualified_method: str, filename: str) -> str:
+    # com.example.Api$Inner.handler -> com/example/Api.java
+    parts = qualified_method.split(".")
+    return "/".join(parts[:-2] + [filename])
+
+
+def extract_frames(text: str) -> List[Frame]:
+    """
+    Find the source locations referenced by Python, Node, Java and Sentry
+    stack traces in a log, in order of appearance and without duplicates
+    """
+    found = []
+    for match in _PYTHON_FRAME.finditer(text):
+        found.append((match.start(), match.group(1), match.group(2), match.group(3)))
+    for match in _NODE_FRAME.finditer(text):
+        if match.group(2) is not None:
+            path, line, function = match.group(2), match.group(3), match.group(1)
+        else:
+            path, line, function = match.group(4), match.group(5), None
+        if _SOURCE_PATH.search(path):
+            found.append((match.start(), path, line, function))
+    for match in _JAVA_FRAME.finditer(text):
+        path = _java_path(match.group(1), match.group(2))
+        found.append((match.start(), path, match.group(3), match.group(1).split(".")[-1]))
+    for match in _SENTRY_FRAME.finditer(text):
+        found.append((match.start(), match.group(1), match.group(2), None))
+
+    frames = []
+    seen = set()
+    for _, path, line, function in sorted(found, key=lambda f: f[0]):
+        path = _normalize_path(path)
+        if _is_ignored(path):
+            continue
+        key = (path, int(line))
+        if key in seen:
+            continue
+        seen.add(key)
+        frames.append((path, int(line), function))
+    return frames
+
+
+def build_frames(frames: List[Frame]) -> List[LogFrame]:
+    return [LogFrame(path=path, line=line, function=function) for path, line, function in frames]
+
+
+# Repo -> (sha, basename -> tree paths). Only the latest tree of each repo is
+# kept; a refetched tree with a new sha replaces its index.
+_tree_indexes: Dict[str, Tuple[str, Dict[str, List[str]]]] = {}
+
+
+def _tree_index(tree: GitHubRepoTree) -> Dict[str, List[str]]:
+    cached = _tree_indexes.get(tree.repo)
+    if cached is not None and cached[0] == tree.sha:
+        return cached[1]
+    index = {}
+    for path in tree.paths or []:
+        index.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+    _tree_indexes[tree.repo] = (tree.sha, index)
+    return index
+
+
+def _resolve(frame_path: str, index: Dict[str, List[str]]) -> Optional[str]:
+    """
+    Find the repository file whose path is the longest suffix of the frame path.
+    A match has to cover the whole repository path or more than the file name,
+    so "/srv/http/server.py" doesn't resolve to "app/server.py". Returns
+    None when nothing matches or when the best match is ambiguous.
+    """
+    frame_parts = frame_path.strip("/").split("/")
+    best = None
+    best_score = 0
+    tied = False
+    for candidate in index.get(frame_parts[-1], []):
+        candidate_parts = candidate.split("/")
+        score = 0
+        for frame_part, candidate_part in zip(reversed(frame_parts), reversed(candidate_parts)):
+            if frame_part != candidate_part:
+                break
+            score += 1
+        if score < 2 and score < len(candidate_parts):
+            continue
+        if score > best_score:
+            best, best_score, tied = candidate, score, False
+        elif score == best_score:
+            tied = True
+    return None if tied else best
+
+
+def _merge_windows(lines: List[int], context: int) -> List[Dict[str, int]]:
+    windows = []
+    for line in sorted(set(lines)):
+        start, end = max(1, line - context), line + context
+        if windows and start <= windows[-1]["end"] + 1:
+            windows[-1]["end"] = max(windows[-1]["end"], end)
+        else:
+            windows.append({"start": start, "end": end})
+    return windows
+
+
+class TracebackService:
+    @staticmethod
+    def index_missing_frames(db: Session, log_ids) -> int:
+        """
+        Extract frames for logs in `log_ids` (a query of LogFile.id) that were
+        stored before frames were indexed at ingest. Each log is marked as
+        scanned, so this happens once per log even when it has no stack trace.
+        """
+        unscanned = (
+            LogFile.id.in_(log_ids.scalar_subquery()),
+            ~LogFile.frame_scan.has(),
+        )
+        # Logs whose frames were stored before scans were recorded only need the mark
+        db.execute(
+            insert(LogFrameScan).from_select(
+                ["log_id"], select(LogFile.id).where(*unscanned, LogFile.frames.any())
+            )
+        )
+
+        indexed = 0
+        logs = db.query(LogFile.id, LogFile.content).filter(*unscanned)
+        for log_id, content in logs.yield_per(100):
+            for path, line, function in extract_frames(content or ""):
+                db.add(LogFrame(log_id=log_id, path=path, line=line, function=function))
+                indexed += 1
+            db.add(LogFrameScan(log_id=log_id))
+        db.commit()
+        return indexed
+
+    @staticmethod
+    def get_source_context(
+        db: Session,
+        log_id: Optional[int] = None,
+        prefix: Optional[str] = None,
+        repos: Optional[List[str]] = None,
+        context: int = 10,
+    ):
+        """
+        Resolve the stack frames of a log, or of every log whose filename starts
+        with `prefix` (e.g. all files of one uploaded zip), against the cached
+        repository trees and return the referenced files with merged line windows
+        """
+        log_ids = db.query(LogFile.id)
+        if log_id is not None:
+            log_ids = log_ids.filter(LogFile.id == log_id)
+        if prefix is not None:
+            log_ids = log_ids.filter(LogFile.filename.startswith(prefix, autoescape=True))
+
+        TracebackService.index_missing_frames(db, log_ids)
+
+        query = db.query(GitHubRepoTree)
+        if repos is not None:
+            query = query.filter(GitHubRepoTree.repo.in_(repos))
+        indexes = [(tree.repo, _tree_index(tree)) for tree in query.all()]
+
+        files: Dict[Tuple[str, str], Dict] = {}
+        unresolved = []
+        frame_count = 0
+        frames = (
+            db.query(LogFrame)
+            .filter(LogFrame.log_id.in_(log_ids.scalar_subquery()))
+            .order_by(LogFrame.id)
+        )
+        for frame in frames.yield_per(1000):
+            frame_count += 1
+            # Frames stored before a location was added to _IGNORED_PATHS
+            if _is_ignored(frame.path):
+                continue
+            resolved = False
+            for repo, index in indexes:
+                path = _resolve(frame.path, index)
+                if path is None:
+                    continue
+                entry = files.setdefault(
+                    (repo, path), {"repo": repo, "path": path, "lines": [], "log_ids": set()}
+                )
+                entry["lines"].append(frame.line)
+                entry["log_ids"].add(frame.log_id)
+                resolved = True
+            if not resolved and len(unresolved) < _MAX_UNRESOLVED:
+                unresolved.append(f"{frame.path}:{frame.line}")
+
+        return {
+            "logs": log_ids.count(),
+            "frames": frame_count,
+            "files": [
+                {
+                    "repo": entry["repo"],
+                    "path": entry["path"],
+                    "lines": sorted(set(entry["lines"])),
+                    "windows": _merge_windows(entry["lines"], context),
+                    "log_ids": sorted(entry["log_ids"]),
+                }
+                for entry in files.values()
+            ],
+            "unresolved": unresolved,
+        }
@@ -0,0 +1,115 @@
+"""
+Benchmark for zip ingestion.
+
+Builds a synthetic archive of mixed-encoding log files and times it with an
+increasing number of worker processes, using the same spawned pool as the
+server. Two modes:
+
+    decode  only iter_zip_members (decoding plus stack frame extraction)
+    ingest  LogService.process_zip_file into a scratch SQLite database, which
+            includes the single writer thread and shows where it caps scaling
+
+Run from the backend directory:
+    python -m benchmarks.ingest_benchmark --files 400 --lines 20000 --mode ingest
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+import zipfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base
+from app.services.ingest_service import iter_zip_members, shutdown_pool, start_pool
+from app.services.log_service import LogService
+
+ENCODINGS = ["utf-8", "utf-8-sig", "utf-16", "latin-1"]
+
+
+def build_archive(path, files, lines):
+    line = "2025-01-01 12:00:00,000 ERROR worker-{i} failed to process résumé #{n}\r\n"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        for i in range(files):
+            encoding = ENCODINGS[i % len(ENCODINGS)]
+            text = "".join(line.format(i=i, n=n) for n in range(lines))
+            zip_ref.writestr(f"bench/log_{i:05d}.txt", text.encode(encoding))
+
+
+def run(mode, zip_path, members, workers, temp_dir):
+    executor = None
+    if workers > 1:
+        executor = start_pool(workers)
+        # Warm the pool up so process startup isn't counted, as in the server
+        list(executor.map(abs, range(workers)))
+    try:
+        if mode == "ingest":
+            return _timed_ingest(zip_path, workers, temp_dir)
+        return _timed_decode(zip_path, members, executor, 2 * workers)
+    finally:
+        shutdown_pool()
+
+
+def _timed_decode(zip_path, members, executor, max_in_flight):
+    start = time.perf_counter()
+    for _ in iter_zip_members(zip_path, members, executor, max_in_flight):
+        pass
+    return time.perf_counter() - start
+
+
+def _timed_ingest(zip_path, workers, temp_dir):
+    db_path = os.path.join(temp_dir, f"bench-{workers}.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    with open(zip_path, "rb") as f:
+        data = f.read()
+
+    db = sessionmaker(bind=engine)()
+    try:
+        start = time.perf_counter()
+        # process_zip_file prints a line per file
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            LogService.process_zip_file(data, "bench.zip", db, workers=workers)
+        return time.perf_counter() - start
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mode", choices=["decode", "ingest"], default="decode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, "bench.zip")
+        print(f"Building archive with {args.files} files x {args.lines} lines")
+        build_archive(zip_path, args.files, args.lines)
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            members = zip_ref.namelist()
+            size = sum(info.file_size for info in zip_ref.infolist())
+        print(f"Uncompressed size: {size / 1024 / 1024:.1f} MiB, mode: {args.mode}")
+
+        workers = 1
+        baseline = None
+        while True:
+            elapsed = run(args.mode, zip_path, members, workers, temp_dir)
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers:<3} {elapsed:7.2f}s "
+                f"{size / 1024 / 1024 / elapsed:8.1f} MiB/s "
+                f"speedup x{baseline / elapsed:.2f}"
+            )
+            if workers >= args.max_workers:
+                break
+            workers = min(workers * 2, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
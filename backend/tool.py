@@ -1,35 +1,14 @@
-def get_logs(uri="http://127.0.0.1:8001/api/logs"):
-    import requests
-    import json
+def get_logs(limit=None, max_chars_per_log=None):
+    from app.database import SessionLocal
+    from app.database.models import LogFile
+    from app.services.prompt_service import PromptService
 
     try:
-        response = requests.get(uri)
-        response.raise_for_status()
-        logs = response.json()
+        with SessionLocal() as db:
+            query = db.query(LogFile).order_by(LogFile.id)
+            if limit is not None:
+                query = query.limit(limit)
+            prompt, _ = PromptService.logs_prompt(query.yield_per(100), max_chars_per_log)
+            return prompt
     except Exception as e:
         return f"Failed to fetch logs: {e}"
-
-    prompt = [
-        "You are an expert data engineer.",
-        "I will provide you with several logs from different files.",
-        "Your task is to analyze them and identify any issues or suggest improvements based on the content.",
-        "",
-        "Each log has the following structure:",
-        "- id: a numeric identifier for the file",
-        "- filename: the name of the file",
-        "- content: the actual log or data from the file",
-        "",
-        "You might receive multiple files at once. Please analyze **all of them** before responding.",
-        "Here are the logs:\n"
-    ]
-
-    for log in logs:
-        prompt.append(
-            f"\n--- LOG START ---\n"
-            f"id: {log.get('id')}\n"
-            f"filename: {log.get('filename')}\n"
-            f"content:\n{log.get('content')}\n"
-            f"--- LOG END ---"
-        )
-
-    return "\n".join(prompt)